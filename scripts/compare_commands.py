@@ -6,6 +6,8 @@ Outputs missing commands that should be added to the grammar.
 import os
 import re
 
+from instrument import parse_args, profiler_for
+
 
 def load_current_commands(path):
     """Load commands from current_commands.txt"""
@@ -49,21 +51,9 @@ def check_abbreviation_coverage(cmd, current_commands):
     return False
 
 
-def main():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    current_path = os.path.join(script_dir, 'current_commands.txt')
-    reference_path = os.path.join(script_dir, 'stata_reference_commands.txt')
-
-    current = load_current_commands(current_path)
-    reference = load_reference_commands(reference_path)
-
-    print(f"Current grammar commands: {len(current)}")
-    print(f"Reference commands: {len(reference)}")
-    print()
-
-    # Find commands in reference but NOT in current
-    # Also check abbreviation coverage
+def find_missing_commands(current, reference):
+    """Split reference commands missing from the grammar into truly missing
+    and possibly covered by an abbreviation."""
     truly_missing = []
     possibly_covered = []
 
@@ -74,10 +64,11 @@ def main():
             else:
                 truly_missing.append(cmd)
 
-    # Find commands in current but not in reference (potentially deprecated)
-    extra = sorted(current - reference)
+    return truly_missing, possibly_covered
 
-    # Write results
+
+def write_results(script_dir, truly_missing, possibly_covered):
+    """Write missing_commands.txt and possibly_covered.txt; return their paths."""
     output_path = os.path.join(script_dir, 'missing_commands.txt')
     with open(output_path, 'w') as f:
         f.write(f"# Missing Stata commands (not in grammar, not covered by abbreviations)\n")
@@ -93,6 +84,39 @@ def main():
         for cmd in possibly_covered:
             f.write(cmd + '\n')
 
+    return output_path, covered_path
+
+
+def main():
+    args = parse_args(__doc__)
+    profiler = profiler_for('compare_commands', args)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    current_path = os.path.join(script_dir, 'current_commands.txt')
+    reference_path = os.path.join(script_dir, 'stata_reference_commands.txt')
+
+    with profiler.stage('parse') as stage:
+        current = load_current_commands(current_path)
+        reference = load_reference_commands(reference_path)
+        stage['items'] = len(current) + len(reference)
+
+    print(f"Current grammar commands: {len(current)}")
+    print(f"Reference commands: {len(reference)}")
+    print()
+
+    # Find commands in reference but NOT in current
+    # Also check abbreviation coverage
+    with profiler.stage('compare') as stage:
+        truly_missing, possibly_covered = find_missing_commands(current, reference)
+        stage['items'] = len(reference)
+
+    # Write results
+    with profiler.stage('write') as stage:
+        output_path, covered_path = write_results(script_dir, truly_missing,
+                                                  possibly_covered)
+        stage['items'] = len(truly_missing) + len(possibly_covered)
+
     print(f"=== TRULY MISSING (not in grammar at all) ===")
     print(f"Total: {len(truly_missing)}")
     print()
@@ -111,6 +135,8 @@ def main():
     print(f"  {output_path}")
     print(f"  {covered_path}")
 
+    profiler.finish(args)
+
 
 if __name__ == '__main__':
     main()
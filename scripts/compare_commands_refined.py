@@ -5,6 +5,8 @@ in stata.cson (outside the main 'Built in commands' regex).
 
 import os
 
+from instrument import parse_args, profiler_for
+
 # Commands that are handled by SPECIAL PATTERNS in stata.cson
 # (not in the main built-in regex, but still highlighted)
 HANDLED_ELSEWHERE = {
@@ -126,11 +128,8 @@ def load_commands(path):
     return commands
 
 
-def main():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    current = load_commands(os.path.join(script_dir, 'current_commands.txt'))
-    reference = load_commands(os.path.join(script_dir, 'stata_reference_commands.txt'))
-
+def find_truly_missing(current, reference):
+    """Return the sorted reference commands not covered by the grammar."""
     # All commands currently in the grammar (including special patterns)
     all_covered = current | HANDLED_ELSEWHERE
 
@@ -147,6 +146,11 @@ def main():
 
     truly_missing = sorted(truly_missing)
 
+    return truly_missing
+
+
+def categorize_commands(truly_missing):
+    """Group missing commands into the categories used in the output file."""
     # Categorize missing commands
     categories = {
         'New estimation commands (Stata 16+)': [],
@@ -194,8 +198,11 @@ def main():
             else:
                 categories['New estimation commands (Stata 16+)'].append(cmd)
 
-    # Write categorized output
-    output_path = os.path.join(script_dir, 'missing_commands_categorized.txt')
+    return categories
+
+
+def write_categorized(output_path, truly_missing, categories):
+    """Write the categorized list of missing commands."""
     with open(output_path, 'w') as f:
         f.write("# Missing Stata Commands — Categorized\n")
         f.write(f"# Total missing: {len(truly_missing)}\n")
@@ -208,6 +215,30 @@ def main():
                 for cmd in sorted(cmds):
                     f.write(f"  {cmd}\n")
 
+
+def main():
+    args = parse_args(__doc__)
+    profiler = profiler_for('compare_commands_refined', args)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    with profiler.stage('parse') as stage:
+        current = load_commands(os.path.join(script_dir, 'current_commands.txt'))
+        reference = load_commands(os.path.join(script_dir, 'stata_reference_commands.txt'))
+        stage['items'] = len(current) + len(reference)
+
+    with profiler.stage('compare') as stage:
+        truly_missing = find_truly_missing(current, reference)
+        stage['items'] = len(reference)
+
+    with profiler.stage('categorize') as stage:
+        categories = categorize_commands(truly_missing)
+        stage['items'] = len(truly_missing)
+
+    with profiler.stage('write') as stage:
+        output_path = os.path.join(script_dir, 'missing_commands_categorized.txt')
+        write_categorized(output_path, truly_missing, categories)
+        stage['items'] = len(truly_missing)
+
     print(f"Total truly missing commands: {len(truly_missing)}")
     print(f"\nSaved categorized list to: {output_path}")
     print()
@@ -217,6 +248,8 @@ def main():
             for cmd in sorted(cmds):
                 print(f"  {cmd}")
 
+    profiler.finish(args)
+
 
 if __name__ == '__main__':
     main()
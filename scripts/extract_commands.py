@@ -5,10 +5,24 @@ Outputs a sorted list of all built-in commands to current_commands.txt
 
 import re
 
-def extract_commands(cson_path):
-    with open(cson_path, 'r') as f:
-        content = f.read()
+from instrument import NULL_PROFILER, parse_args, profiler_for
 
+
+def extract_commands(cson_path, profiler=NULL_PROFILER):
+    with profiler.stage('parse') as stage:
+        with open(cson_path, 'r') as f:
+            content = f.read()
+        stage['items'] = content.count('\n')
+
+    with profiler.stage('extract') as stage:
+        builtin, addon = extract_commands_from_content(content)
+        stage['items'] = len(builtin) + len(addon)
+
+    return builtin, addon
+
+
+def extract_commands_from_content(content):
+    """Return the sorted built-in and add-on commands of the grammar text."""
     # Find the "Built in commands" match pattern
     # The regex is between \\b( and )\\b on the line(s) after "Built in commands"
     builtin_match = re.search(
@@ -18,8 +32,7 @@ def extract_commands(cson_path):
     )
 
     if not builtin_match:
-        print("ERROR: Could not find 'Built in commands' pattern")
-        return []
+        raise ValueError("Could not find 'Built in commands' pattern")
 
     raw = builtin_match.group(1)
     # Split on pipe, clean up any regex-specific entries
@@ -54,30 +67,38 @@ def extract_commands(cson_path):
     return sorted(set(commands)), sorted(set(addon_commands))
 
 
+def write_command_list(path, commands, label):
+    """Write a sorted command list with the usual header."""
+    with open(path, 'w') as f:
+        f.write(f"# {label} commands extracted from stata.cson\n")
+        f.write(f"# Total: {len(commands)}\n\n")
+        for cmd in commands:
+            f.write(cmd + '\n')
+
+
 if __name__ == '__main__':
     import os
 
+    args = parse_args(__doc__)
+    profiler = profiler_for('extract_commands', args)
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     repo_dir = os.path.dirname(script_dir)
     cson_path = os.path.join(repo_dir, 'grammars', 'stata.cson')
 
-    builtin, addon = extract_commands(cson_path)
+    builtin, addon = extract_commands(cson_path, profiler)
 
-    # Write built-in commands
-    output_path = os.path.join(script_dir, 'current_commands.txt')
-    with open(output_path, 'w') as f:
-        f.write(f"# Built-in commands extracted from stata.cson\n")
-        f.write(f"# Total: {len(builtin)}\n\n")
-        for cmd in builtin:
-            f.write(cmd + '\n')
+    with profiler.stage('write') as stage:
+        # Write built-in commands
+        output_path = os.path.join(script_dir, 'current_commands.txt')
+        write_command_list(output_path, builtin, 'Built-in')
 
-    # Write add-on commands
-    addon_path = os.path.join(script_dir, 'current_addon_commands.txt')
-    with open(addon_path, 'w') as f:
-        f.write(f"# Add-on commands extracted from stata.cson\n")
-        f.write(f"# Total: {len(addon)}\n\n")
-        for cmd in addon:
-            f.write(cmd + '\n')
+        # Write add-on commands
+        addon_path = os.path.join(script_dir, 'current_addon_commands.txt')
+        write_command_list(addon_path, addon, 'Add-on')
+        stage['items'] = len(builtin) + len(addon)
 
     print(f"Extracted {len(builtin)} built-in commands -> {output_path}")
     print(f"Extracted {len(addon)} add-on commands -> {addon_path}")
+
+    profiler.finish(args)
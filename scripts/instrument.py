@@ -0,0 +1,235 @@
+"""
+Stage timing and memory instrumentation shared by the grammar maintenance
+scripts. Each script wraps its stages (parse, extract, compare, rebuild,
+write; suffixed with the input, e.g. parse_cson / parse_json, when a script
+reads more than one) in profiler.stage(); with --profile the wall time,
+tracemalloc peak memory and item count of every stage are written as JSON,
+and --compare prints the change against a previous profile.
+
+Stages that read stata.cson or stata.json count its lines as items; every
+other stage counts commands.
+
+Wall times are measured while tracemalloc is tracing, which slows stages
+unevenly (allocation-heavy ones such as json.loads the most). Use
+--no-memory for undistorted timings; the report records which mode it was
+taken in, and --compare warns when the two runs differ.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# A stage this much slower (or hungrier) than in the previous run is flagged
+REGRESSION_RATIO = 1.25
+# Timings and peaks below these are too noisy to flag
+MIN_WALL_MS = 1.0
+MIN_PEAK_KB = 64.0
+
+
+def parse_args(description):
+    """Parse the --profile / --compare / --no-memory options common to all scripts.
+
+    The --compare file is loaded up front into args.previous, so that a bad
+    path is reported before the script rewrites any of its outputs.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--profile', metavar='PATH',
+                        help='write stage timings and memory as JSON to PATH')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare stage timings against a previous --profile output')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not trace memory, for timings without tracemalloc overhead')
+    args = parser.parse_args()
+
+    args.previous = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                args.previous = json.load(f)
+        except OSError as e:
+            parser.error(f"cannot read --compare file: {e}")
+        except ValueError as e:
+            parser.error(f"--compare file {args.compare} is not valid JSON: {e}")
+        if not isinstance(args.previous, dict) or 'stages' not in args.previous:
+            parser.error(f"--compare file {args.compare} is not a --profile output")
+    return args
+
+
+class Profiler:
+    """Records wall time, peak memory and item counts per named stage.
+
+    A stage's peak_kb is the most memory it had allocated at any point on
+    top of what was already held when it started, so earlier stages do not
+    show up in it; the process-wide peak is reported separately. Stages are
+    flat: a stage must not be opened inside another one, since each stage
+    resets the tracemalloc peak. A stage entered more than once is
+    accumulated under the same name. When disabled, stage() does no
+    measuring at all.
+    """
+
+    def __init__(self, script, enabled=True, memory=True):
+        self.script = script
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.stages = {}
+        self.process_peak = 0
+        self.start = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the enclosed block; set stage['items'] to record a count."""
+        info = {'items': None}
+        if not self.enabled:
+            yield info
+            return
+
+        if not self.memory:
+            start = time.perf_counter()
+            try:
+                yield info
+            finally:
+                wall_ms = (time.perf_counter() - start) * 1000
+                self._record(name, wall_ms, None, None, info['items'])
+            return
+
+        tracemalloc.reset_peak()
+        mem_start, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            mem_end, peak = tracemalloc.get_traced_memory()
+            self.process_peak = max(self.process_peak, peak)
+            self._record(name, wall_ms, peak - mem_start, mem_end - mem_start,
+                         info['items'])
+
+    def _record(self, name, wall_ms, peak, alloc, items):
+        stage = self.stages.setdefault(name, {
+            'wall_ms': 0.0, 'peak_kb': None, 'alloc_kb': None, 'items': None,
+            'calls': 0,
+        })
+        stage['wall_ms'] += wall_ms
+        if peak is not None:
+            stage['peak_kb'] = max(stage['peak_kb'] or 0.0, peak / 1024)
+            stage['alloc_kb'] = (stage['alloc_kb'] or 0.0) + alloc / 1024
+        if items is not None:
+            stage['items'] = (stage['items'] or 0) + items
+        stage['calls'] += 1
+
+    def report(self):
+        """Return the collected measurements as a JSON-serialisable dict."""
+        stages = []
+        for name, stage in self.stages.items():
+            stages.append({
+                'name': name,
+                'wall_ms': round(stage['wall_ms'], 3),
+                'peak_kb': _round(stage['peak_kb']),
+                'alloc_kb': _round(stage['alloc_kb']),
+                'items': stage['items'],
+                'calls': stage['calls'],
+            })
+        return {
+            'script': self.script,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'memory_traced': self.memory,
+            'total_wall_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'process_peak_kb': _round(self.process_peak / 1024) if self.memory else None,
+            'stages': stages,
+        }
+
+    def finish(self, args):
+        """Write and/or compare the report as requested on the command line."""
+        if not self.enabled:
+            return
+        report = self.report()
+
+        if args.profile:
+            with open(args.profile, 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            print(f"\nProfile written to {args.profile}")
+
+        if args.previous is not None:
+            previous = args.previous
+            if previous.get('script') != report['script']:
+                print(f"\nWarning: {args.compare} is a profile of "
+                      f"{previous.get('script')}, not {report['script']}; "
+                      f"stages are matched by name only")
+            if previous.get('memory_traced', True) != report['memory_traced']:
+                print(f"\nWarning: only one of the two runs traced memory; "
+                      f"wall times include tracemalloc overhead in that one")
+            print_comparison(compare_reports(report, previous))
+
+
+# Default for library functions called without profiling (e.g. by watch_grammar.py)
+NULL_PROFILER = Profiler('', enabled=False)
+
+
+def profiler_for(script, args):
+    """Create a profiler that only measures when --profile or --compare is given."""
+    return Profiler(script, enabled=bool(args.profile or args.compare),
+                    memory=not args.no_memory)
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def _ratio(current, previous):
+    if not previous or current is None:
+        return None
+    return current / previous
+
+
+def compare_reports(current, previous):
+    """Match stages by name and compute the change against a previous run."""
+    previous_stages = {s['name']: s for s in previous.get('stages', [])}
+    rows = []
+    for stage in current['stages']:
+        old = previous_stages.pop(stage['name'], None)
+        if old is None:
+            rows.append({'name': stage['name'], 'current': stage, 'previous': None,
+                         'time_ratio': None, 'peak_ratio': None, 'regression': False})
+            continue
+        time_ratio = _ratio(stage['wall_ms'], old['wall_ms'])
+        peak_ratio = _ratio(stage['peak_kb'], old.get('peak_kb'))
+        slower = (time_ratio is not None and time_ratio > REGRESSION_RATIO
+                  and stage['wall_ms'] >= MIN_WALL_MS)
+        hungrier = (peak_ratio is not None and peak_ratio > REGRESSION_RATIO
+                    and stage['peak_kb'] >= MIN_PEAK_KB)
+        regression = slower or hungrier
+        rows.append({'name': stage['name'], 'current': stage, 'previous': old,
+                     'time_ratio': time_ratio, 'peak_ratio': peak_ratio,
+                     'regression': regression})
+    for old in previous_stages.values():
+        rows.append({'name': old['name'], 'current': None, 'previous': old,
+                     'time_ratio': None, 'peak_ratio': None, 'regression': False})
+    return rows
+
+
+def _fmt(stage, key, spec):
+    if stage is None or stage.get(key) is None:
+        return '-'
+    return format(stage[key], spec)
+
+
+def print_comparison(rows):
+    """Print a per-stage table of the comparison against a previous run."""
+    print()
+    print(f"{'stage':<14} {'wall ms (prev -> now)':>24} {'peak KB (prev -> now)':>26} "
+          f"{'items (prev -> now)':>22}")
+    for row in rows:
+        old, new = row['previous'], row['current']
+        wall = f"{_fmt(old, 'wall_ms', '.1f')} -> {_fmt(new, 'wall_ms', '.1f')}"
+        peak = f"{_fmt(old, 'peak_kb', '.0f')} -> {_fmt(new, 'peak_kb', '.0f')}"
+        items = f"{_fmt(old, 'items', 'd')} -> {_fmt(new, 'items', 'd')}"
+        flag = '  <-- regression' if row['regression'] else ''
+        print(f"{row['name']:<14} {wall:>24} {peak:>26} {items:>22}{flag}")
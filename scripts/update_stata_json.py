@@ -8,6 +8,8 @@ import json
 import re
 import os
 
+from instrument import NULL_PROFILER, parse_args, profiler_for
+
 
 def extract_commands_from_regex(regex_str):
     """Extract plain command names from a pipe-separated regex string."""
@@ -25,12 +27,22 @@ def extract_commands_from_regex(regex_str):
     return plain, special
 
 
-def extract_cson_commands(repo_dir):
+def extract_cson_commands(repo_dir, profiler=NULL_PROFILER):
     """Extract commands from the updated stata.cson built-in regex."""
     cson_path = os.path.join(repo_dir, 'grammars', 'stata.cson')
-    with open(cson_path, 'r') as f:
-        content = f.read()
+    with profiler.stage('parse_cson') as stage:
+        with open(cson_path, 'r') as f:
+            content = f.read()
+        stage['items'] = content.count('\n')
+
+    with profiler.stage('extract_cson') as stage:
+        plain, special = extract_cson_commands_from_content(content)
+        stage['items'] = len(plain) + len(special)
+    return plain, special
 
+
+def extract_cson_commands_from_content(content):
+    """Extract commands from the built-in regex of the stata.cson text."""
     pattern = r"comment:\s*'Built in commands'\s*\n\s*match:\s*'\\\\b\((.+?)\)\\\\b'"
     match = re.search(pattern, content, re.DOTALL)
     if not match:
@@ -41,85 +53,121 @@ def extract_cson_commands(repo_dir):
     return set(plain), special
 
 
-def update_json_file(json_path, new_commands):
+def update_json_file(json_path, new_commands, profiler=NULL_PROFILER):
     """Update the stata.json file by adding new commands to the built-in regex."""
-    with open(json_path, 'r') as f:
-        content = f.read()
+    with profiler.stage('parse_json') as stage:
+        with open(json_path, 'r') as f:
+            content = f.read()
+
+        # Parse JSON to find the built-in commands pattern
+        data = json.loads(content)
+        stage['items'] = content.count('\n')
+    added, _ = update_builtin_entry(data, new_commands, profiler)
+    plain, special = builtin_entry_commands(data)
+    with profiler.stage('write') as stage:
+        write_json_file(json_path, data)
+        stage['items'] = len(plain) + len(special)
 
-    # Parse JSON to find the built-in commands pattern
-    data = json.loads(content)
+    return added
 
-    # Find the built-in commands entry in repository.commands-other.patterns
+
+def find_builtin_entry(data):
+    """Return the built-in commands entry in repository.commands-other.patterns."""
     commands_patterns = data['repository']['commands-other']['patterns']
-    builtin_entry = None
     for entry in commands_patterns:
         if entry.get('comment') == 'Built in commands':
-            builtin_entry = entry
-            break
+            return entry
+
+    raise ValueError("Could not find 'Built in commands' entry in stata.json")
 
-    if not builtin_entry:
-        raise ValueError("Could not find 'Built in commands' entry in stata.json")
 
-    old_regex = builtin_entry['match']
+def builtin_entry_commands(data):
+    """Return the plain and special entries of the built-in regex in stata.json."""
+    old_regex = find_builtin_entry(data)['match']
 
     # Extract the body between \b( and )\b
     body_match = re.match(r'^\\b\((.+)\)\\b$', old_regex, re.DOTALL)
     if not body_match:
         raise ValueError(f"Unexpected regex format: {old_regex[:80]}...")
 
-    regex_body = body_match.group(1)
-    plain_cmds, special_entries = extract_commands_from_regex(regex_body)
-
-    # Add new commands
-    existing = set(plain_cmds)
-    added = []
-    for cmd in new_commands:
-        if cmd not in existing:
-            plain_cmds.append(cmd)
-            added.append(cmd)
-
-    # Sort all plain commands alphabetically
-    plain_cmds = sorted(set(plain_cmds))
-
-    # Rebuild with special entries in their alphabetical position
-    special_dict = {}
-    for entry in special_entries:
-        core = re.sub(r'\(\?[<!]+[^)]*\)', '', entry)
-        if core:
-            special_dict[core] = entry
-
-    all_commands = []
-    for cmd in plain_cmds:
-        if cmd in special_dict:
-            all_commands.append(special_dict[cmd])
-            del special_dict[cmd]
-        else:
-            all_commands.append(cmd)
-
-    # Add any remaining special entries at the end
-    for entry in special_dict.values():
-        all_commands.append(entry)
-
-    # Build new regex
-    new_regex = '\\b(' + '|'.join(all_commands) + ')\\b'
+    return extract_commands_from_regex(body_match.group(1))
+
+
+def update_builtin_entry(data, new_commands, profiler=NULL_PROFILER, remove=()):
+    """Add new commands to the built-in regex of an already parsed stata.json.
+
+    Plain commands listed in remove are dropped from the regex. Returns the
+    sorted lists of commands that were actually added and removed.
+    """
+    with profiler.stage('extract_json') as stage:
+        builtin_entry = find_builtin_entry(data)
+        plain_cmds, special_entries = builtin_entry_commands(data)
+        stage['items'] = len(plain_cmds) + len(special_entries)
+
+    with profiler.stage('compare') as stage:
+        # Add new commands
+        existing = set(plain_cmds)
+        added = []
+        for cmd in new_commands:
+            if cmd not in existing:
+                plain_cmds.append(cmd)
+                added.append(cmd)
+
+        remove = set(remove)
+        removed = sorted(existing & remove)
+        if removed:
+            plain_cmds = [cmd for cmd in plain_cmds if cmd not in remove]
+        stage['items'] = len(new_commands) + len(remove)
+
+    with profiler.stage('rebuild') as stage:
+        # Sort all plain commands alphabetically
+        plain_cmds = sorted(set(plain_cmds))
+
+        # Rebuild with special entries in their alphabetical position
+        special_dict = {}
+        for entry in special_entries:
+            core = re.sub(r'\(\?[<!]+[^)]*\)', '', entry)
+            if core:
+                special_dict[core] = entry
+
+        all_commands = []
+        for cmd in plain_cmds:
+            if cmd in special_dict:
+                all_commands.append(special_dict[cmd])
+                del special_dict[cmd]
+            else:
+                all_commands.append(cmd)
+
+        # Add any remaining special entries at the end
+        for entry in special_dict.values():
+            all_commands.append(entry)
+
+        # Build new regex
+        new_regex = '\\b(' + '|'.join(all_commands) + ')\\b'
+        stage['items'] = len(all_commands)
 
     # Update the entry
     builtin_entry['match'] = new_regex
 
-    # Write the updated JSON with same formatting
+    return sorted(added), removed
+
+
+def write_json_file(json_path, data):
+    """Write stata.json with the same formatting as the original file."""
     with open(json_path, 'w') as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
         f.write('\n')
 
-    return sorted(added)
-
 
 def main():
+    args = parse_args(__doc__)
+    profiler = profiler_for('update_stata_json', args)
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     repo_dir = os.path.dirname(script_dir)
 
     # Extract commands from the updated CSON (source of truth)
-    cson_commands, _ = extract_cson_commands(repo_dir)
+    cson_commands, _ = extract_cson_commands(repo_dir, profiler)
     print(f"Commands in updated stata.cson: {len(cson_commands)}")
 
     # Update stata.json
@@ -128,7 +176,7 @@ def main():
         print(f"Error: {json_path} not found")
         return
 
-    added = update_json_file(json_path, cson_commands)
+    added = update_json_file(json_path, cson_commands, profiler)
 
     print(f"Commands added to stata.json: {len(added)}")
     for cmd in added:
@@ -136,6 +184,8 @@ def main():
 
     print(f"\nUpdated {json_path}")
 
+    profiler.finish(args)
+
 
 if __name__ == '__main__':
     main()
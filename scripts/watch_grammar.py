@@ -0,0 +1,244 @@
+"""
+Watch grammars/stata.cson and keep the derived files in sync while editing.
+Keeps the extracted command sets and the parsed stata.json in memory, and on
+each save applies only the commands that were added or removed to stata.json,
+rewrites current_commands.txt / current_addon_commands.txt and the
+compare_commands*.py outputs when the command sets changed, then runs a quick
+tokenization smoke benchmark over the example .do files.
+
+Usage: python watch_grammar.py [--interval SECONDS] [--once]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+import compare_commands
+import compare_commands_refined
+from extract_commands import extract_commands_from_content, write_command_list
+from update_stata_json import (extract_cson_commands_from_content,
+                               update_builtin_entry, write_json_file)
+
+
+def find_builtin_regex(data):
+    """Return the compiled built-in commands regex from parsed stata.json."""
+    for entry in data['repository']['commands-other']['patterns']:
+        if entry.get('comment') == 'Built in commands':
+            return re.compile(entry['match'])
+    raise ValueError("Could not find 'Built in commands' entry in stata.json")
+
+
+def load_sample_lines(repo_dir):
+    """Load the lines of the example .do files used for the smoke benchmark."""
+    lines = []
+    for path in sorted(glob.glob(os.path.join(repo_dir, 'examples', '*.do'))):
+        with open(path, 'r') as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def smoke_benchmark(regex, lines, rounds=5):
+    """Tokenize the sample lines with the built-in regex.
+
+    Returns (milliseconds per round, number of matches per round).
+    """
+    matches = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        matches = 0
+        for line in lines:
+            for _ in regex.finditer(line):
+                matches += 1
+    elapsed = (time.perf_counter() - start) * 1000 / rounds
+    return elapsed, matches
+
+
+class GrammarWatcher:
+    """In-memory state of the grammar and the files derived from it."""
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+        self.script_dir = os.path.join(repo_dir, 'scripts')
+        self.cson_path = os.path.join(repo_dir, 'grammars', 'stata.cson')
+        self.json_path = os.path.join(repo_dir, 'stata.json')
+        self.builtin_path = os.path.join(self.script_dir, 'current_commands.txt')
+        self.addon_path = os.path.join(self.script_dir, 'current_addon_commands.txt')
+
+        self.json_mtime = None
+        self.json_data = None
+        self.regex = None
+        self._reload_json()
+        self.sample_lines = load_sample_lines(repo_dir)
+        self.reference = compare_commands_refined.load_commands(
+            os.path.join(self.script_dir, 'stata_reference_commands.txt'))
+
+        self.mtime = None
+        self.builtin = None
+        self.addon = None
+        self.json_commands = None
+
+    def poll(self):
+        """Return True if stata.cson changed since the last check."""
+        try:
+            mtime = os.stat(self.cson_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return True
+
+    def _reload_json(self):
+        """Re-read stata.json if it changed on disk since it was last loaded.
+
+        Returns False if it could not be read, e.g. while it is being edited.
+        """
+        try:
+            mtime = os.stat(self.json_path).st_mtime_ns
+            if mtime == self.json_mtime:
+                return True
+            with open(self.json_path, 'r') as f:
+                self.json_data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipped: could not read {self.json_path}: {e}")
+            return False
+        if self.json_mtime is not None:
+            print(f"Reloaded {self.json_path} (changed on disk)")
+        self.json_mtime = mtime
+        self.regex = self._compile_regex()
+        return True
+
+    def _compile_regex(self):
+        """Compile the built-in regex of stata.json, or None if Python rejects it."""
+        try:
+            return find_builtin_regex(self.json_data)
+        except re.error as e:
+            # Oniguruma accepts some syntax that Python's re does not
+            print(f"Smoke benchmark disabled: built-in regex does not compile: {e}")
+            return None
+
+    def _write_comparison(self, builtin):
+        """Rerun the compare_commands*.py comparisons on the in-memory sets."""
+        current = set(builtin)
+        truly_missing, possibly_covered = compare_commands.find_missing_commands(
+            current, self.reference)
+        paths = list(compare_commands.write_results(
+            self.script_dir, truly_missing, possibly_covered))
+
+        refined_missing = compare_commands_refined.find_truly_missing(
+            current, self.reference)
+        categories = compare_commands_refined.categorize_commands(refined_missing)
+        refined_path = os.path.join(self.script_dir, 'missing_commands_categorized.txt')
+        compare_commands_refined.write_categorized(refined_path, refined_missing,
+                                                   categories)
+        paths.append(refined_path)
+        return [os.path.basename(path) for path in paths]
+
+    def refresh(self):
+        """Re-extract the grammar and apply only what changed."""
+        start = time.perf_counter()
+
+        # Pick up changes made to stata.json outside the watcher, so they are
+        # not overwritten by the in-memory copy
+        if not self._reload_json():
+            return
+
+        try:
+            with open(self.cson_path, 'r') as f:
+                content = f.read()
+            builtin, addon = extract_commands_from_content(content)
+            json_commands, _ = extract_cson_commands_from_content(content)
+        except (OSError, ValueError) as e:
+            # The grammar is mid-edit or being replaced; wait for the next save
+            print(f"Skipped: {e}")
+            return
+
+        initial = self.json_commands is None
+        if initial:
+            added = json_commands
+            removed = set()
+        else:
+            added = json_commands - self.json_commands
+            removed = self.json_commands - json_commands
+
+        # Unlike update_stata_json.py, removals are applied too, so that
+        # intermediate saves (typos, half-typed names) do not stay in stata.json
+        json_added, json_removed = [], []
+        if added or removed:
+            json_added, json_removed = update_builtin_entry(
+                self.json_data, added, remove=removed)
+
+        files_written = []
+        try:
+            if json_added or json_removed:
+                write_json_file(self.json_path, self.json_data)
+                self.json_mtime = os.stat(self.json_path).st_mtime_ns
+                self.regex = self._compile_regex()
+            if builtin != self.builtin:
+                write_command_list(self.builtin_path, builtin, 'Built-in')
+                files_written.append(os.path.basename(self.builtin_path))
+                files_written.extend(self._write_comparison(builtin))
+            if addon != self.addon:
+                write_command_list(self.addon_path, addon, 'Add-on')
+                files_written.append(os.path.basename(self.addon_path))
+        except OSError as e:
+            # Keep the previous state so the next save applies the changes
+            # again, and re-read stata.json since the in-memory copy is ahead
+            print(f"Skipped: could not write derived files: {e}")
+            self.json_mtime = None
+            return
+
+        self.builtin = builtin
+        self.addon = addon
+        self.json_commands = json_commands
+        update_ms = (time.perf_counter() - start) * 1000
+
+        event = 'initial sync' if initial else 'stata.cson changed'
+        print(f"[{time.strftime('%H:%M:%S')}] {event} (update {update_ms:.0f} ms)")
+        for cmd in json_added:
+            print(f"  + {cmd}")
+        for cmd in json_removed:
+            print(f"  - {cmd}")
+        if files_written:
+            print(f"  Rewrote {', '.join(files_written)}")
+        if self.regex is not None:
+            bench_ms, matches = smoke_benchmark(self.regex, self.sample_lines)
+            print(f"  Smoke benchmark: {len(self.sample_lines)} lines, "
+                  f"{matches} matches, {bench_ms:.1f} ms")
+
+    def run(self, interval):
+        """Poll stata.cson until interrupted."""
+        print(f"Watching {self.cson_path} (Ctrl-C to stop)")
+        try:
+            while True:
+                if self.poll():
+                    self.refresh()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\nStopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='seconds between checks of stata.cson (default 0.1)')
+    parser.add_argument('--once', action='store_true',
+                        help='sync once and exit instead of watching')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    repo_dir = os.path.dirname(script_dir)
+
+    watcher = GrammarWatcher(repo_dir)
+    if args.once:
+        watcher.poll()
+        watcher.refresh()
+    else:
+        watcher.run(args.interval)
+
+
+if __name__ == '__main__':
+    main()